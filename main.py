@@ -3,157 +3,393 @@ Frontend GUI for UIP + PPP Exchange Rate Simulation
 Tkinter interface for the exchange rate simulation engine
 """
 
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import tkinter as tk
 from tkinter import ttk, messagebox
 import sys
+import itertools
+from collections import OrderedDict
+from functools import lru_cache
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
 
-# Import the simulation engine
-from simulation_engine import ExchangeRateSimulator
+# numpy, matplotlib and the simulation engine are imported by
+# cargar_backend() on first use, so the Tk window paints without waiting
+np = None
+ExchangeRateSimulator = None
+SCENARIOS = {}
+sorted_percentiles = None
+simulator = None
+fig = ax = canvas = None  # Single figure/canvas reused by every plot view
+_artistas = (None, None)  # (view drawn on ax, its artists) for in-place updates
+SEED_SEQ = None  # Session root: every run spawns child streams from it
 
 # Global variables
-simulator = ExchangeRateSimulator()
 df_resultados = None
-distribuciones = {}
-current_params = None  # Track current parameters
+dist_arr = None  # (n_scenarios, n_sim) simulated rates, one row per scenario
+idx_of = {}  # Scenario -> row of dist_arr
+estadisticas = {}  # Scenario -> mean and percentiles, computed once per simulation
+curva_impacto = None  # (scenario names, means, P5, P95) arrays for the impact plot
+epoch = None  # Identifies the loaded simulation run
+_epochs = itertools.count()
+PERCENTILES = [1, 5, 50, 95, 99]
+HIST_BINS = 60
+N_SIM_BORRADOR = 10000  # Default: enough for the plotted means/percentiles
+N_SIM_ALTA = 100000  # "Alta precisión"
+SIM_CACHE_SIZE = 8  # Max parameter sets kept in memory
+_sim_cache = OrderedDict()  # params key -> (df_resultados, dist_arr, idx_of, estadisticas, curva_impacto, epoch), LRU order
+_factores_cache = OrderedDict()  # params key without S_t -> simulate_news_factors matrix, LRU order
+SIM_DEBOUNCE_MS = 300  # Quiet time after the last edit before re-simulating
+_after_id = None  # Pending debounced simulation
+SIM_POLL_MS = 50  # Polling interval for background simulations
+_executor = ThreadPoolExecutor(max_workers=1)  # One run at a time: the engine already parallelizes each run
+_motor_lote = None  # Engine owned by the worker thread, reused so its draw buffers are too
+_pending = {}  # params key -> (future, callback to run when it finishes)
+_params = None  # Parsed SimParams, reset whenever an input is edited
 current_view = 'impacto'  # Track current view: 'impacto', 'dispersión', 'estadisticas'
 
-def get_current_params():
-    """Get current parameters from GUI"""
-    return {
-        'S_t': float(entry_S.get()),
-        'theta': float(entry_theta.get()),
-        'n_sim': int(entry_nsim.get()),
-        'i_dom_range': (float(entry_idom_min.get()), float(entry_idom_max.get())),
-        'i_for_range': (float(entry_ifor_min.get()), float(entry_ifor_max.get())),
-        'pi_dom_range': (float(entry_pidom_min.get()), float(entry_pidom_max.get())),
-        'pi_for_range': (float(entry_pifor_min.get()), float(entry_pifor_max.get())),
-        'sesgo': var_sesgo.get()
-    }
-
-def params_changed():
-    """Check if parameters have changed since last simulation"""
-    global current_params
-    new_params = get_current_params()
-    
-    if current_params is None:
-        current_params = new_params
-        return True
+def cargar_backend():
+    """Import the numeric and plotting stack and build the plot canvas, once"""
+    global np, ExchangeRateSimulator, SCENARIOS, sorted_percentiles, simulator, fig, ax, canvas, SEED_SEQ
+    if simulator is not None:
+        return
     
-    if new_params != current_params:
-        current_params = new_params
-        return True
+    import numpy as np
+    import matplotlib
+    matplotlib.use('Agg')  # Figures are only embedded through FigureCanvasTkAgg, no pyplot
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from simulation_engine import ExchangeRateSimulator, SCENARIOS, sorted_percentiles, warm_up_kernel
     
-    return False
+    warm_up_kernel()  # On the Tk thread, before any background simulation
+    
+    SEED_SEQ = np.random.SeedSequence()
+    fig = Figure(figsize=(8, 4))
+    ax = fig.add_subplot(111)
+    canvas = FigureCanvasTkAgg(fig, master=frame_plot)
+    canvas.get_tk_widget().pack()
+    combo_escenario.configure(values=list(SCENARIOS))
+    simulator = ExchangeRateSimulator()
 
-def ejecutar_simulacion():
-    """Execute simulation using the backend engine"""
-    global df_resultados, distribuciones
+class SimParams(NamedTuple):
+    """Simulation parameters parsed from the GUI entries (hashable, used as cache key)"""
+    S_t: float
+    theta: float
+    n_sim: int
+    i_dom_range: tuple
+    i_for_range: tuple
+    pi_dom_range: tuple
+    pi_for_range: tuple
+    sesgo: bool
+
+def get_current_params():
+    """Get current parameters from GUI, parsing the entries only after they were edited"""
+    global _params
+    if _params is None:
+        _params = SimParams(
+            S_t=float(entry_S.get()),
+            theta=float(entry_theta.get()),
+            n_sim=int(entry_nsim.get()),
+            i_dom_range=(float(entry_idom_min.get()), float(entry_idom_max.get())),
+            i_for_range=(float(entry_ifor_min.get()), float(entry_ifor_max.get())),
+            pi_dom_range=(float(entry_pidom_min.get()), float(entry_pidom_max.get())),
+            pi_for_range=(float(entry_pifor_min.get()), float(entry_pifor_max.get())),
+            sesgo=var_sesgo.get()
+        )
+    return _params
+
+def ejecutar_simulacion(on_ready=None):
+    """
+    Make simulation results for the current GUI parameters available
+    
+    Returns True when the results are cached and loaded into df_resultados /
+    dist_arr (including when only S_t changed and the cached factors are
+    rescaled). Otherwise the simulation runs in a background thread,
+    False is returned and on_ready (if given) is called once it finishes.
+    """
+    global df_resultados, dist_arr, idx_of, estadisticas, curva_impacto, epoch
+    cargar_backend()
     
     # Get parameters from GUI
     params = get_current_params()
-    S_t = params['S_t']
-    theta = params['theta']
-    n_sim = params['n_sim']
-    i_dom_range = params['i_dom_range']
-    i_for_range = params['i_for_range']
-    pi_dom_range = params['pi_dom_range']
-    pi_for_range = params['pi_for_range']
-    sesgo = params['sesgo']
-    skew_params = {'loc': np.mean(i_dom_range), 'scale': 0.012, 'skew': 6}
-
-    # Run simulation using backend
-    df_resultados, distribuciones = simulator.simulate_news_impact(
+    
+    clave_factores = params._replace(S_t=None)
+    if params not in _sim_cache and clave_factores in _factores_cache:
+        # Only the spot rate changed: rescale the cached factors, no new draws
+        _factores_cache.move_to_end(clave_factores)
+        resultados, _ = simulator.apply_spot(params.S_t, _factores_cache[clave_factores])
+        guardar_resultados(params, resultados, simulator.sims_matrix, simulator.scenario_names)
+    
+    if params in _sim_cache:
+        _sim_cache.move_to_end(params)
+        df_resultados, dist_arr, idx_of, estadisticas, curva_impacto, epoch = _sim_cache[params]
+        # Keep the engine state in sync for get_scenario_summary (row views, no copies)
+        simulator.results = df_resultados
+        simulator.sims_matrix = dist_arr
+        simulator.scenario_names = list(idx_of)
+        simulator.presorted = True
+        simulator.distributions = {escenario: dist_arr[i] for escenario, i in idx_of.items()}
+        return True
+    
+    if params in _pending:
+        # Already running: only the latest view asking for it gets called back
+        if on_ready is not None:
+            _pending[params] = (_pending[params][0], on_ready)
+        return False
+    
+    S_t = params.S_t
+    theta = params.theta
+    n_sim = params.n_sim
+    i_dom_range = params.i_dom_range
+    i_for_range = params.i_for_range
+    pi_dom_range = params.pi_dom_range
+    pi_for_range = params.pi_for_range
+    sesgo = params.sesgo
+    skew_params = {'loc': sum(i_dom_range) * 0.5, 'scale': 0.012, 'skew': 6}
+
+    # Newer parameters supersede runs still waiting for the worker
+    for clave, (pendiente, _) in list(_pending.items()):
+        if pendiente.cancel():
+            del _pending[clave]
+    
+    # Run simulation in the background on the worker's own engine, so the
+    # shared simulator is only ever touched from the Tk thread. The engine
+    # simulates all scenarios in one vectorized batch.
+    future = _executor.submit(
+        simular_lote,
         S_t, theta, n_sim,
         i_dom_range, i_for_range,
         pi_dom_range, pi_for_range,
         sesgo_tasa_dom=sesgo,
-        skew_params=skew_params
+        skew_params=skew_params,
+        seed=SEED_SEQ.spawn(1)[0]
     )
+    _pending[params] = (future, on_ready)
+    barra_progreso.start()
+    root.after(SIM_POLL_MS, _check_future, params)
+    return False
+
+def simular_lote(S_t, *args, **kwargs):
+    """
+    Run the simulation on the worker thread's engine
+    
+    Returns the results, the (n_scenarios, n_sim) matrix, its scenario
+    names and the spot-independent factors, which are cached so a later
+    change of S_t alone is one multiply. The engine itself is not returned:
+    the next run may already be reusing it.
+    """
+    global _motor_lote
+    if _motor_lote is None:
+        _motor_lote = ExchangeRateSimulator()
+    factores = _motor_lote.simulate_news_factors(*args, **kwargs)
+    resultados, _ = _motor_lote.apply_spot(S_t, factores)
+    return resultados, _motor_lote.sims_matrix, _motor_lote.scenario_names, factores
+
+def guardar_resultados(key, resultados, arr, nombres):
+    """Cache a finished simulation and its precomputed plot statistics"""
+    # arr is already one (n_scenarios, n_sim) array: no stacking copy
+    indices = {escenario: i for i, escenario in enumerate(nombres)}
+    _sim_cache[key] = (
+        resultados,
+        arr,
+        indices,
+        *calcular_estadisticas(arr, indices),
+        next(_epochs)
+    )
+    if len(_sim_cache) > SIM_CACHE_SIZE:
+        _sim_cache.popitem(last=False)
+
+def _check_future(key):
+    """Poll a background simulation and cache its results when done"""
+    if key not in _pending:
+        return  # Cancelled by a newer run
+    future, on_ready = _pending[key]
+    if not future.done():
+        root.after(SIM_POLL_MS, _check_future, key)
+        return
+    
+    del _pending[key]
+    if not _pending:
+        barra_progreso.stop()
     
-    mostrar_curva_impacto()
+    resultados, arr, nombres, factores = future.result()
+    _factores_cache[key._replace(S_t=None)] = factores
+    if len(_factores_cache) > SIM_CACHE_SIZE:
+        _factores_cache.popitem(last=False)
+    guardar_resultados(key, resultados, arr, nombres)
+    
+    if on_ready is not None:
+        on_ready()
+
+@lru_cache(maxsize=32)
+def resumen_escenario(escenario, S_t, i_dom, i_for, epoch):
+    """Memoized simulator.get_scenario_summary; epoch ties the entry to one simulation run"""
+    return simulator.get_scenario_summary(escenario, S_t, i_dom, i_for)
+
+def calcular_estadisticas(arr, indices):
+    """
+    Mean, plotted percentiles and histogram of every scenario row, computed once per simulation
+    
+    Returns the per-scenario stats dict and the impact curve arrays
+    (names, means, P5, P95) in row order.
+    """
+    # The engine returns every row sorted ascending: percentiles and range
+    # are index lookups and only the mean needs a pass over the data
+    percentiles = sorted_percentiles(arr, PERCENTILES).T
+    medias = arr.mean(axis=1, dtype=np.float64)
+    minimos, maximos = arr[:, 0], arr[:, -1]
+    stats = {}
+    for escenario, i in indices.items():
+        stats[escenario] = {f'P{p}': v for p, v in zip(PERCENTILES, percentiles[:, i])}
+        stats[escenario]['Media'] = medias[i]
+        edges = np.linspace(minimos[i], maximos[i], HIST_BINS + 1)
+        # Bin counts are the gaps between where the edges fall in the sorted row
+        inicio = np.searchsorted(arr[i], edges[:-1].astype(arr.dtype))
+        stats[escenario]['hist'] = (np.diff(inicio, append=arr.shape[1]), edges)
+    p5, p95 = percentiles[PERCENTILES.index(5)], percentiles[PERCENTILES.index(95)]
+    return stats, (list(indices), medias, p5, p95)
+
+def programar_simulacion(*_):
+    """Debounce parameter edits so only the last one triggers a simulation (Tk command or variable trace)"""
+    global _after_id, _params
+    _params = None  # Inputs changed: re-parse on next use
+    if _after_id is not None:
+        root.after_cancel(_after_id)
+    _after_id = root.after(SIM_DEBOUNCE_MS, simulacion_diferida)
+
+def cambiar_precision():
+    """Switch the number of simulations between draft and high precision"""
+    entry_nsim.delete(0, tk.END)
+    entry_nsim.insert(0, str(N_SIM_ALTA if var_hires.get() else N_SIM_BORRADOR))
+    programar_simulacion()
+
+def simulacion_diferida():
+    """Run the debounced simulation and refresh the plot being shown"""
+    global _after_id
+    _after_id = None
+    vistas = {'impacto': mostrar_curva_impacto, 'dispersión': mostrar_dispersión}
+    try:
+        vistas.get(current_view, ejecutar_simulacion)()
+    except ValueError:
+        pass  # Entry still being edited (empty or partial number)
 
 def mostrar_curva_impacto():
     """Display impact curve chart"""
     global current_view
     current_view = 'impacto'
     
-    if df_resultados is None or params_changed():
-        ejecutar_simulacion()
-        
-    fig, ax = plt.subplots(figsize=(8, 4))
-    x = np.arange(len(df_resultados))
-    ax.errorbar(x, df_resultados['Media'], 
-                yerr=[df_resultados['Media'] - df_resultados['P5'], 
-                      df_resultados['P95'] - df_resultados['Media']],
-                fmt='o', capsize=5)
-    ax.set_xticks(x)
-    ax.set_xticklabels(df_resultados['Escenario'], rotation=45, ha='right')
-    ax.set_title("Curva de Impacto de Noticias en Tipo de Cambio")
-    ax.set_ylabel("COP/USD")
-    ax.grid(True)
-    for label in ax.get_xticklabels():
-        label.set_rotation(0)
-        label.set_ha('center')
-
-    actualizar_grafico(fig)
+    if not ejecutar_simulacion(mostrar_curva_impacto):
+        return
+    redraw_impact(*curva_impacto)
 
 def mostrar_dispersión():
     """Display distribution histogram"""
     global current_view
     current_view = 'dispersión'
     
-    if df_resultados is None or params_changed():
-        ejecutar_simulacion()
+    if not ejecutar_simulacion(mostrar_dispersión):
+        return
         
     escenario = combo_escenario.get()
-    datos = distribuciones.get(escenario, [])
+    if escenario not in idx_of:
+        return
+    redraw_hist(escenario, estadisticas[escenario])
+
+def redraw_impact(nombres, media, p5, p95):
+    """Draw the impact curve, updating the existing artists if it is already shown"""
+    global _artistas
+    x = np.arange(len(media))
+    
+    vista, artistas = _artistas
+    if vista == 'impacto' and len(artistas[0].get_xdata()) == len(x):
+        linea, (cap_inf, cap_sup), (barras,) = artistas
+        linea.set_data(x, media)
+        cap_inf.set_data(x, p5)
+        cap_sup.set_data(x, p95)
+        barras.set_segments([[(xi, lo), (xi, hi)] for xi, lo, hi in zip(x, p5, p95)])
+        ax.relim()
+        ax.autoscale_view()
+    else:
+        ax.clear()
+        contenedor = ax.errorbar(x, media, yerr=np.stack([media - p5, p95 - media]),
+                                 fmt='o', capsize=5)
+        ax.set_xticks(x)
+        ax.set_title("Curva de Impacto de Noticias en Tipo de Cambio")
+        ax.set_ylabel("COP/USD")
+        ax.grid(True, alpha=1.0)  # Grid style survives ax.clear(); undo the histogram's
+        _artistas = ('impacto', contenedor.lines)
+    
+    ax.set_xticklabels(nombres, rotation=0, ha='center')
+
+    actualizar_grafico()
+
+def redraw_hist(escenario, stats):
+    """Draw a scenario's precomputed histogram, updating the existing artists if one is already shown"""
+    global _artistas
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+    
+    counts, edges = stats['hist']
+    lineas = [
+        (stats['Media'], 'red', '--', 1.5, 'Media'),
+        (stats['P1'], 'darkgreen', '-', 2, 'P1'),
+        (stats['P5'], 'orange', '-', 2, 'P5'),
+        (stats['P99'], 'darkgreen', '-', 2, 'P99'),
+        (stats['P95'], 'orange', '-', 2, 'P95'),
+    ]
+    valores, colores, estilos, anchos, _ = zip(*lineas)
+    segmentos = [[(valor, 0), (valor, 1)] for valor in valores]
+    
+    vista, artistas = _artistas
+    if vista == 'dispersión' and len(artistas[0]) == len(counts):
+        barras, percentiles = artistas
+        for barra, x0, ancho, alto in zip(barras, edges[:-1], np.diff(edges), counts):
+            barra.set_x(x0)
+            barra.set_width(ancho)
+            barra.set_height(alto)
+        percentiles.set_segments(segmentos)
+        ax.relim()
+        ax.autoscale_view()
+    else:
+        ax.clear()
+        barras = ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+                        color='skyblue', edgecolor='black', alpha=0.7)
+        ax.set_xlabel("COP/USD")
+        ax.set_ylabel("Frecuencia")
+        ax.grid(True, alpha=0.3)
+        # Percentile lines as one collection spanning the full height
+        percentiles = LineCollection(
+            segmentos, colors=colores, linestyles=estilos, linewidths=anchos,
+            transform=ax.get_xaxis_transform()  # x in data, y in axes coordinates
+        )
+        ax.add_collection(percentiles, autolim=False)
+        _artistas = ('dispersión', (barras, percentiles))
     
-    fig, ax = plt.subplots(figsize=(8, 4))
-    ax.hist(datos, bins=60, color='skyblue', edgecolor='black', alpha=0.7)
     ax.set_title(f"Distribución Esperada - {escenario}")
-    ax.set_xlabel("COP/USD")
-    ax.set_ylabel("Frecuencia")
-    ax.grid(True, alpha=0.3)
-    for label in ax.get_xticklabels():
-        label.set_rotation(0)
-        label.set_ha('center')
-    
-    # Add percentiles to the plot
-    mean_val = np.mean(datos)
-    p1_negative_val = np.percentile(datos, 1)
-    p5_negative_val = np.percentile(datos, 5)
-    p1_positive_val = np.percentile(datos, 99)
-    p5_positive_val = np.percentile(datos, 95)
-    ax.axvline(mean_val, color='red', linestyle='--', label=f'Media: {mean_val:.2f}')
-    ax.axvline(p1_negative_val, color='darkgreen', linestyle='-', linewidth=2, label=f'P1: {p1_negative_val:.2f}')
-    ax.axvline(p5_negative_val, color='orange', linestyle='-', linewidth=2, label=f'P5: {p5_negative_val:.2f}')
-    ax.axvline(p1_positive_val, color='darkgreen', linestyle='-', linewidth=2, label=f'P99: {p1_positive_val:.2f}')
-    ax.axvline(p5_positive_val, color='orange', linestyle='-', linewidth=2, label=f'P95: {p5_positive_val:.2f}')
-    ax.legend()
-    
-    actualizar_grafico(fig)
+    ax.legend(handles=[
+        Line2D([], [], color=color, linestyle=estilo, linewidth=ancho, label=f'{nombre}: {valor:.2f}')
+        for valor, color, estilo, ancho, nombre in lineas
+    ])
+    
+    actualizar_grafico()
 
 def mostrar_resumen_completo():
     """Display comprehensive summary with forward rates and VaR"""
     global current_view
     current_view = 'resumen'
     
-    if df_resultados is None or params_changed():
-        ejecutar_simulacion()
+    if not ejecutar_simulacion(mostrar_resumen_completo):
+        return
     
     # Get current parameters
     params = get_current_params()
-    S_t = params['S_t']
-    i_dom = np.mean(params['i_dom_range'])  # Use mean of range
-    i_for = np.mean(params['i_for_range'])  # Use mean of range
+    S_t = params.S_t
+    i_dom = sum(params.i_dom_range) * 0.5  # Use mean of range
+    i_for = sum(params.i_for_range) * 0.5  # Use mean of range
     
     escenario = combo_escenario.get()
     
     # Get comprehensive summary
-    resumen = simulator.get_scenario_summary(escenario, S_t, i_dom, i_for)
+    resumen = resumen_escenario(escenario, S_t, i_dom, i_for, epoch)
     
     if resumen is None:
         return
@@ -168,19 +404,21 @@ def mostrar_resumen_completo():
     text_widget.pack(fill=tk.BOTH, expand=True)
     
     # Format and display comprehensive summary
-    summary_text = f"RESUMEN COMPLETO - {escenario.upper()}\n"
-    summary_text += "=" * 50 + "\n\n"
-    summary_text += f"Media: {resumen['Media']:,.2f}\n"
-    summary_text += f"P1: {resumen['P1']:,.2f}\n"
-    summary_text += f"P5: {resumen['P5']:,.2f}\n"
-    summary_text += f"P50: {resumen['P50']:,.2f}\n"
-    summary_text += f"P95: {resumen['P95']:,.2f}\n"
-    summary_text += f"P99: {resumen['P99']:,.2f}\n"
-    summary_text += f"VaR_5pct_COP: {resumen['VaR_5pct_COP']:,.2f}\n"
-    summary_text += f"VaR_1pct_COP: {resumen['VaR_1pct_COP']:,.2f}\n"
-    summary_text += f"Forward implícito: {resumen['Forward_implicito']:,.2f}\n"
-    
-    text_widget.insert(tk.END, summary_text)
+    parts = [f"RESUMEN COMPLETO - {escenario.upper()}"]
+    parts.append("=" * 50)
+    parts.append("")
+    parts.append(f"Media: {resumen['Media']:,.2f}")
+    parts.append(f"P1: {resumen['P1']:,.2f}")
+    parts.append(f"P5: {resumen['P5']:,.2f}")
+    parts.append(f"P50: {resumen['P50']:,.2f}")
+    parts.append(f"P95: {resumen['P95']:,.2f}")
+    parts.append(f"P99: {resumen['P99']:,.2f}")
+    parts.append(f"VaR_5pct_COP: {resumen['VaR_5pct_COP']:,.2f}")
+    parts.append(f"VaR_1pct_COP: {resumen['VaR_1pct_COP']:,.2f}")
+    parts.append(f"Forward implícito: {resumen['Forward_implicito']:,.2f}")
+    parts.append("")  # Trailing newline
+    
+    text_widget.insert(tk.END, "\n".join(parts))
     text_widget.config(state=tk.DISABLED)
 
 def evaluar_forward():
@@ -188,14 +426,14 @@ def evaluar_forward():
     global current_view
     current_view = 'evaluacion'
     
-    if df_resultados is None or params_changed():
-        ejecutar_simulacion()
+    if not ejecutar_simulacion(evaluar_forward):
+        return
     
     # Get current parameters
     params = get_current_params()
-    S_t = params['S_t']
-    i_dom = np.mean(params['i_dom_range'])
-    i_for = np.mean(params['i_for_range'])
+    S_t = params.S_t
+    i_dom = sum(params.i_dom_range) * 0.5
+    i_for = sum(params.i_for_range) * 0.5
     
     # Get offered forward price
     try:
@@ -207,7 +445,7 @@ def evaluar_forward():
     escenario = combo_escenario.get()
     
     # Get comprehensive summary
-    resumen = simulator.get_scenario_summary(escenario, S_t, i_dom, i_for)
+    resumen = resumen_escenario(escenario, S_t, i_dom, i_for, epoch)
     
     if resumen is None:
         return
@@ -228,82 +466,89 @@ def evaluar_forward():
     text_widget.pack(fill=tk.BOTH, expand=True)
     
     # Build evaluation text
-    eval_text = f"EVALUACIÓN DE CONTRATO FORWARD\n"
-    eval_text += "=" * 50 + "\n"
+    parts = ["EVALUACIÓN DE CONTRATO FORWARD"]
+    parts.append("=" * 50)
     
     # Current parameters
-    eval_text += f"ESCENARIO: {escenario}\n"
-    eval_text += f"Spot actual: {S_t:,.2f} COP/USD\n"
-    eval_text += f"Forward ofrecido: {forward_ofrecido:,.2f} COP/USD\n\n"
+    parts.append(f"ESCENARIO: {escenario}")
+    parts.append(f"Spot actual: {S_t:,.2f} COP/USD")
+    parts.append(f"Forward ofrecido: {forward_ofrecido:,.2f} COP/USD")
+    parts.append("")
     
     # CIP Analysis
-    eval_text += "📊 ANÁLISIS CIP (PARIDAD CUBIERTA)\n"
-    eval_text += "-" * 40 + "\n"
-    eval_text += f"Forward CIP implícito: {cip_forward:,.2f} COP/USD\n"
+    parts.append("📊 ANÁLISIS CIP (PARIDAD CUBIERTA)")
+    parts.append("-" * 40)
+    parts.append(f"Forward CIP implícito: {cip_forward:,.2f} COP/USD")
     
     if forward_ofrecido <= cip_forward:
-        eval_text += "✅ Forward ≤ CIP: CONTRATO JUSTO O FAVORABLE\n"
+        parts.append("✅ Forward ≤ CIP: CONTRATO JUSTO O FAVORABLE")
         cip_favorable = True
     else:
-        eval_text += "❌ Forward > CIP: POSIBLE SOBREPRECIO\n"
+        parts.append("❌ Forward > CIP: POSIBLE SOBREPRECIO")
         cip_favorable = False
     
-    eval_text += f"Diferencia: {forward_ofrecido - cip_forward:+,.2f} COP/USD\n\n"
+    parts.append(f"Diferencia: {forward_ofrecido - cip_forward:+,.2f} COP/USD")
+    parts.append("")
     
     # UIP+PPP Analysis
-    eval_text += "📈 ANÁLISIS UIP + PPP (SPOT ESPERADO)\n"
-    eval_text += "=" * 50 + "\n"
-    eval_text += f"Spot esperado (media): {spot_esperado:,.2f} COP/USD\n"
-    eval_text += f"P5: {p5:,.2f} COP/USD\n"
-    eval_text += f"P95: {p95:,.2f} COP/USD\n"
+    parts.append("📈 ANÁLISIS UIP + PPP (SPOT ESPERADO)")
+    parts.append("=" * 50)
+    parts.append(f"Spot esperado (media): {spot_esperado:,.2f} COP/USD")
+    parts.append(f"P5: {p5:,.2f} COP/USD")
+    parts.append(f"P95: {p95:,.2f} COP/USD")
     
     # Protection analysis
     if forward_ofrecido < spot_esperado:
-        eval_text += "✅ Forward < spot esperado: TE PROTEGE\n"
+        parts.append("✅ Forward < spot esperado: TE PROTEGE")
         protege = True
     else:
-        eval_text += "❌ Forward ≥ spot esperado: NO TE PROTEGE\n"
+        parts.append("❌ Forward ≥ spot esperado: NO TE PROTEGE")
         protege = False
     
     # Uncertainty reduction analysis
     if p5 <= forward_ofrecido <= p95:
-        eval_text += "✅ Dentro P5-P95: REDUCE INCERTIDUMBRE RAZONABLEMENTE\n"
+        parts.append("✅ Dentro P5-P95: REDUCE INCERTIDUMBRE RAZONABLEMENTE")
         incertidumbre_ok = True
     elif forward_ofrecido > p95:
-        eval_text += "⚠️ Mayor que P95: PROBABLEMENTE PAGAS DE MÁS\n"
+        parts.append("⚠️ Mayor que P95: PROBABLEMENTE PAGAS DE MÁS")
         incertidumbre_ok = False
     else:
-        eval_text += "✅ Menor que P5: MUY CONSERVADOR\n"
+        parts.append("✅ Menor que P5: MUY CONSERVADOR")
         incertidumbre_ok = True
     
-    eval_text += f"Diferencia vs spot esperado: {forward_ofrecido - spot_esperado:+,.2f} COP/USD\n\n"
+    parts.append(f"Diferencia vs spot esperado: {forward_ofrecido - spot_esperado:+,.2f} COP/USD")
+    parts.append("")
     
     # Final recommendation
-    eval_text += "🎯 RECOMENDACIÓN FINAL\n"
-    eval_text += "=" * 30 + "\n\n"
+    parts.append("🎯 RECOMENDACIÓN FINAL")
+    parts.append("=" * 30)
+    parts.append("")
     
     # Decision logic
     acepta_condicion1 = forward_ofrecido <= cip_forward
     acepta_condicion2 = forward_ofrecido < spot_esperado
     
     if acepta_condicion1 or acepta_condicion2:
-        eval_text += "✅ ACEPTA EL CONTRATO\n\n"
-        eval_text += "Razones:\n"
+        parts.append("✅ ACEPTA EL CONTRATO")
+        parts.append("")
+        parts.append("Razones:")
         if acepta_condicion1:
-            eval_text += "• Forward ≤ CIP (paridad cubierta)\n"
+            parts.append("• Forward ≤ CIP (paridad cubierta)")
         if acepta_condicion2:
-            eval_text += "• Forward < spot esperado (protección)\n"
+            parts.append("• Forward < spot esperado (protección)")
     else:
-        eval_text += "⚠️ NEGOCIA O RECHAZA\n\n"
-        eval_text += "Razones:\n"
-        eval_text += "• Forward > CIP (sobreprecio)\n"
-        eval_text += "• Forward > spot esperado (sin protección)\n"
+        parts.append("⚠️ NEGOCIA O RECHAZA")
+        parts.append("")
+        parts.append("Razones:")
+        parts.append("• Forward > CIP (sobreprecio)")
+        parts.append("• Forward > spot esperado (sin protección)")
     
-    eval_text += "\n" + "=" * 50 + "\n"
-    eval_text += "Nota: Esta evaluación se basa en el modelo UIP+PPP y paridad cubierta de tasas de interés (CIP)."
+    parts.append("")
+    parts.append("=" * 50)
+    parts.append("Nota: Esta evaluación se basa en el modelo UIP+PPP y paridad cubierta de tasas de interés (CIP).")
     
     # Insert text and configure
-    text_widget.insert(tk.END, eval_text)
+    text_widget.insert(tk.END, "\n".join(parts))
     text_widget.config(state=tk.DISABLED)
     
     # Add scrollbar
@@ -311,87 +556,97 @@ def evaluar_forward():
     scrollbar.pack(side="right", fill="y")
     text_widget.configure(yscrollcommand=scrollbar.set)
 
-def actualizar_grafico(fig):
-    """Update the plot in the GUI"""
-    for widget in frame_plot.winfo_children():
-        widget.destroy()
-    canvas = FigureCanvasTkAgg(fig, master=frame_plot)
-    canvas.draw()
-    canvas.get_tk_widget().pack()
+def actualizar_grafico():
+    """Schedule a repaint of the embedded canvas"""
+    canvas.draw_idle()
 
 def on_closing():
     """Handle window closing properly"""
-    plt.close('all')  # Close all matplotlib figures
+    # Drop queued runs; a running simulation still finishes before the interpreter exits
+    _executor.shutdown(wait=False, cancel_futures=True)
     root.quit()       # Quit the mainloop
     root.destroy()    # Destroy the window
     sys.exit(0)       # Exit the program
 
-# Create main window
-root = tk.Tk()
-root.title("Simulación UIP + PPP con Impacto de Noticias")
-root.protocol("WM_DELETE_WINDOW", on_closing)
-
-# Create frames
-frame_inputs = ttk.Frame(root)
-frame_inputs.pack(padx=10, pady=5)
-
-frame_plot = ttk.Frame(root)
-frame_plot.pack(padx=10, pady=10)
-
-# Create input fields
-labels = [
-    ("TRM (spot)", "4000"), ("theta", "0.6"), ("# Simulaciones", "100000"),
-    ("i Minimo Colombiano", "0.08"), ("i Maximo Colombiano", "0.11"),
-    ("i Minimo Extranjero", "0.045"), ("i Maximo Extranjero", "0.055"),
-    ("Inflacion Minimo Colombiano", "0.07"), ("Inflacion Maximo Colombiano", "0.09"),
-    ("Inflacion Minimo Extranjero", "0.025"), ("Inflacion Maximo Extranjero", "0.035")
-]
-
-entries = []
-for i, (label_text, default) in enumerate(labels):
-    ttk.Label(frame_inputs, text=label_text).grid(row=i // 2, column=(i % 2) * 2)
-    entry = ttk.Entry(frame_inputs)
-    entry.insert(0, default)
-    entry.grid(row=i // 2, column=(i % 2) * 2 + 1)
-    entries.append(entry)
-
-(
-    entry_S, entry_theta, entry_nsim,
-    entry_idom_min, entry_idom_max,
-    entry_ifor_min, entry_ifor_max,
-    entry_pidom_min, entry_pidom_max,
-    entry_pifor_min, entry_pifor_max
-) = entries
-
-# Create controls
-var_sesgo = tk.BooleanVar(value=True)
-ttk.Checkbutton(frame_inputs, text="Sesgo en tasa doméstica", 
-                variable=var_sesgo).grid(row=6, column=0, columnspan=2)
-
-# Forward price input
-ttk.Label(frame_inputs, text="Forward Price (COP/USD):", 
-          font=("Arial", 10, "bold")).grid(row=6, column=2, columnspan=2, pady=(5,0))
-entry_forward = ttk.Entry(frame_inputs, font=("Arial", 10, "bold"))
-entry_forward.insert(0, "4000")
-entry_forward.grid(row=7, column=2, columnspan=2, pady=(0,5))
-
-# Scenario selector and buttons
-combo_escenario = ttk.Combobox(frame_inputs, 
-                               values=["Normal", "Subida tasas BanRep", 
-                                      "Desanclaje inflacionario", "Choque externo"])
-combo_escenario.set("Normal")
-combo_escenario.grid(row=8, column=0, columnspan=2)
-
-ttk.Button(frame_inputs, text="Ver curva impacto", 
-           command=mostrar_curva_impacto).grid(row=8, column=2)
-ttk.Button(frame_inputs, text="Ver dispersión", 
-           command=mostrar_dispersión).grid(row=8, column=3)
-ttk.Button(frame_inputs, text="Ver resumen completo", 
-           command=mostrar_resumen_completo).grid(row=9, column=2, columnspan=2)
-ttk.Button(frame_inputs, text="Evaluar Forward", 
-           command=evaluar_forward).grid(row=10, column=2, columnspan=2)
-
-# Auto-execute simulation on startup
-root.after(100, mostrar_curva_impacto)
-
-root.mainloop()
\ No newline at end of file
+# The window is only built when run as a script, so importing this module
+# (e.g. from a notebook) pulls in neither Tk nor the plotting stack
+if __name__ == "__main__":
+    # Create main window
+    root = tk.Tk()
+    root.title("Simulación UIP + PPP con Impacto de Noticias")
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+
+    # Create frames
+    frame_inputs = ttk.Frame(root)
+    frame_inputs.pack(padx=10, pady=5)
+
+    frame_plot = ttk.Frame(root)
+    frame_plot.pack(padx=10, pady=10)
+
+    # Create input fields
+    labels = [
+        ("TRM (spot)", "4000"), ("theta", "0.6"), ("# Simulaciones", str(N_SIM_BORRADOR)),
+        ("i Minimo Colombiano", "0.08"), ("i Maximo Colombiano", "0.11"),
+        ("i Minimo Extranjero", "0.045"), ("i Maximo Extranjero", "0.055"),
+        ("Inflacion Minimo Colombiano", "0.07"), ("Inflacion Maximo Colombiano", "0.09"),
+        ("Inflacion Minimo Extranjero", "0.025"), ("Inflacion Maximo Extranjero", "0.035")
+    ]
+
+    # Build all label/entry pairs first, then lay them out in one batch
+    variables = [tk.StringVar(value=default) for _, default in labels]
+    widgets = [(ttk.Label(frame_inputs, text=label_text), ttk.Entry(frame_inputs, textvariable=var))
+               for (label_text, _), var in zip(labels, variables)]
+    for i, (label, entry) in enumerate(widgets):
+        label.grid(row=i // 2, column=(i % 2) * 2)
+        entry.grid(row=i // 2, column=(i % 2) * 2 + 1)
+
+    # Any change to an entry (typing, pasting, programmatic) invalidates the
+    # parsed parameters and schedules a simulation
+    for var in variables:
+        var.trace_add('write', programar_simulacion)
+    entries = [entry for _, entry in widgets]
+
+    (
+        entry_S, entry_theta, entry_nsim,
+        entry_idom_min, entry_idom_max,
+        entry_ifor_min, entry_ifor_max,
+        entry_pidom_min, entry_pidom_max,
+        entry_pifor_min, entry_pifor_max
+    ) = entries
+
+    # Create controls
+    var_sesgo = tk.BooleanVar(value=True)
+    ttk.Checkbutton(frame_inputs, text="Sesgo en tasa doméstica", 
+                    variable=var_sesgo, command=programar_simulacion).grid(row=6, column=0, columnspan=2)
+    var_hires = tk.BooleanVar(value=False)
+    ttk.Checkbutton(frame_inputs, text="Alta precisión", 
+                    variable=var_hires, command=cambiar_precision).grid(row=7, column=0, columnspan=2)
+
+    # Forward price input
+    ttk.Label(frame_inputs, text="Forward Price (COP/USD):", 
+              font=("Arial", 10, "bold")).grid(row=6, column=2, columnspan=2, pady=(5,0))
+    entry_forward = ttk.Entry(frame_inputs, font=("Arial", 10, "bold"))
+    entry_forward.insert(0, "4000")
+    entry_forward.grid(row=7, column=2, columnspan=2, pady=(0,5))
+
+    # Scenario selector and buttons
+    combo_escenario = ttk.Combobox(frame_inputs)  # Values filled in by cargar_backend()
+    combo_escenario.set("Normal")
+    combo_escenario.grid(row=8, column=0, columnspan=2)
+
+    ttk.Button(frame_inputs, text="Ver curva impacto", 
+               command=mostrar_curva_impacto).grid(row=8, column=2)
+    ttk.Button(frame_inputs, text="Ver dispersión", 
+               command=mostrar_dispersión).grid(row=8, column=3)
+    ttk.Button(frame_inputs, text="Ver resumen completo", 
+               command=mostrar_resumen_completo).grid(row=9, column=2, columnspan=2)
+    barra_progreso = ttk.Progressbar(frame_inputs, mode='indeterminate')
+    barra_progreso.grid(row=9, column=0, columnspan=2)
+
+    ttk.Button(frame_inputs, text="Evaluar Forward", 
+               command=evaluar_forward).grid(row=10, column=2, columnspan=2)
+
+    # Auto-execute simulation on startup
+    root.after(100, mostrar_curva_impacto)
+
+    root.mainloop()
@@ -3,9 +3,173 @@ Simulation Engine for UIP + PPP Exchange Rate Model
 Backend logic for exchange rate simulations based on Uncovered Interest Parity and Purchasing Power Parity
 """
 
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import pandas as pd
-from scipy.stats import skewnorm
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; the NumPy kernel is used without it
+    njit = None
+
+
+# News scenarios, as shifts applied to the base parameter ranges
+SCENARIOS = {
+    'Normal': {},
+    'Subida tasas BanRep': {'i_dom_shift': 0.015},
+    'Desanclaje inflacionario': {'pi_dom_shift': 0.02},
+    'Choque externo': {'i_for_shift': -0.01, 'pi_for_shift': -0.005},
+}
+
+# SCENARIOS as arrays: SHIFT_TABLE[k, v] is the shift of variable v
+# (i_dom, i_for, pi_dom, pi_for) in scenario SCENARIO_NAMES[k]
+SCENARIO_NAMES = list(SCENARIOS)
+SHIFT_TABLE = np.array([
+    [SCENARIOS[name].get(f'{var}_shift', 0) for var in ('i_dom', 'i_for', 'pi_dom', 'pi_for')]
+    for name in SCENARIO_NAMES
+], dtype=np.float64)
+
+
+def _skewnorm_rvs(a, loc, scale, size, rng, dtype=np.float64):
+    """
+    Draw skew-normal variates with a single vectorized normal draw
+
+    Uses loc + scale * (delta*|Z1| + sqrt(1 - delta^2)*Z2) with
+    delta = a / sqrt(1 + a^2), matching scipy.stats.skewnorm(a, loc, scale).
+    The shaping is done in place on the normal draws, in the given dtype.
+    """
+    delta = a / np.sqrt(1 + a * a)
+    z = rng.standard_normal((2, size), dtype=dtype)
+    out, z2 = z
+    np.abs(out, out=out)
+    out *= delta
+    z2 *= np.sqrt(1 - delta * delta)
+    out += z2
+    out *= scale
+    out += loc
+    return out
+
+
+def _uip_ppp_numpy(S_t, theta, lows, widths, draws, out):
+    """
+    Batched UIP + PPP rates: out[k, j] = S_t * (1 + delta_e) for scenario k, path j
+
+    lows and widths are (4, n_scenarios) and draws is (4, n_sim), for the
+    variables i_dom, i_for, pi_dom, pi_for in that order. draws and out are
+    float32. The sum is accumulated in place in one float64 work array (plus
+    one scratch array) instead of materializing every variable and
+    intermediate difference.
+    """
+    # 1 + theta*(i_dom - i_for) + (1-theta)*(pi_dom - pi_for), with each
+    # variable low + width * u: constant part first, then one term per variable
+    coefs = np.array([theta, -theta, 1 - theta, theta - 1])
+    delta = np.empty(out.shape)
+    delta[...] = (1 + coefs @ lows)[:, None]
+    tmp = np.empty(out.shape)
+    for coef, width, u in zip(coefs, widths, draws):
+        np.multiply((coef * width)[:, None], u, out=tmp)
+        delta += tmp
+    np.multiply(delta, S_t, out=out)
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _uip_ppp_parallel(S_t, theta, lows, widths, draws, out):
+        """Numba version of _uip_ppp_numpy: one fused pass without temporaries, parallel over paths"""
+        n_scenarios, n_sim = out.shape
+        for k in range(n_scenarios):
+            for j in prange(n_sim):
+                i_dom = lows[0, k] + widths[0, k] * draws[0, j]
+                i_for = lows[1, k] + widths[1, k] * draws[1, j]
+                pi_dom = lows[2, k] + widths[2, k] * draws[2, j]
+                pi_for = lows[3, k] + widths[3, k] * draws[3, j]
+                out[k, j] = S_t * (1 + theta * (i_dom - i_for) + (1 - theta) * (pi_dom - pi_for))
+
+    # Numba's default workqueue threading layer aborts the process if parallel
+    # kernels are launched from several Python threads at once
+    _kernel_lock = threading.Lock()
+
+    def _uip_ppp_kernel(S_t, theta, lows, widths, draws, out):
+        """_uip_ppp_parallel, one launch at a time across threads"""
+        with _kernel_lock:
+            _uip_ppp_parallel(S_t, theta, lows, widths, draws, out)
+else:
+    _N_WORKERS = os.cpu_count() or 1
+    _pool = ThreadPoolExecutor(max_workers=_N_WORKERS)
+
+    def _uip_ppp_kernel(S_t, theta, lows, widths, draws, out):
+        """
+        Threaded fallback for the Numba kernel
+
+        Paths are split into one chunk per CPU and each chunk runs
+        _uip_ppp_numpy on the pool; NumPy releases the GIL in the array
+        arithmetic, so the chunks run in parallel. Chunking along paths also
+        keeps each thread's temporaries small.
+        """
+        bounds = np.linspace(0, out.shape[1], _N_WORKERS + 1).astype(int)
+        chunks = [
+            _pool.submit(_uip_ppp_numpy, S_t, theta, lows, widths, draws[:, lo:hi], out[:, lo:hi])
+            for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+        ]
+        for chunk in chunks:
+            chunk.result()
+
+
+def warm_up_kernel():
+    """
+    Compile (or load from cache) the simulation kernel and start its thread pool
+
+    Call it once from the main thread before simulating from worker threads:
+    with Numba, a first parallel launch from a worker thread can leave the
+    thread pool unable to shut down at interpreter exit. Without Numba it
+    just runs the tiny NumPy fallback.
+    """
+    _uip_ppp_kernel(1.0, 0.0, np.zeros((4, 1)), np.zeros((4, 1)),
+                    np.zeros((4, 1), dtype=np.float32), np.empty((1, 1), dtype=np.float32))
+
+
+def sorted_percentiles(sorted_data, q):
+    """
+    np.percentile (linear interpolation) of data already sorted ascending
+
+    Works along the last axis by indexing, so any number of percentiles
+    costs O(1) each instead of a partitioning pass over the data.
+    """
+    n = sorted_data.shape[-1]
+    pos = np.asarray(q, dtype=np.float64) / 100 * (n - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, n - 1)
+    below, above = sorted_data[..., lo], sorted_data[..., hi]
+    return below + (above - below) * (pos - lo)
+
+
+def _summary_stats(names, sims, presorted=False):
+    """
+    Summary statistics table of an (n_scenarios, n_sim) matrix of simulated rates
+
+    Every statistic is a single reduction along axis 1, and both percentiles
+    come from one np.percentile call. Mean and standard deviation accumulate
+    in float64 so float32 simulations lose no accuracy. With presorted=True
+    (rows sorted ascending) percentiles, min and max are index lookups.
+    """
+    if presorted:
+        p5, p95 = sorted_percentiles(sims, [5, 95]).T
+        lows, highs = sims[:, 0], sims[:, -1]
+    else:
+        p5, p95 = np.percentile(sims, [5, 95], axis=1)
+        lows, highs = sims.min(axis=1), sims.max(axis=1)
+    return pd.DataFrame({
+        'Escenario': list(names),
+        'Media': sims.mean(axis=1, dtype=np.float64),
+        'P5': p5.astype(np.float64),
+        'P95': p95.astype(np.float64),
+        'Std': sims.std(axis=1, dtype=np.float64),
+        'Min': lows.astype(np.float64),
+        'Max': highs.astype(np.float64)
+    })
 
 
 class ExchangeRateSimulator:
@@ -14,14 +178,23 @@ class ExchangeRateSimulator:
     def __init__(self):
         self.results = None
         self.distributions = {}
-        
+        self.sims_matrix = None  # (n_scenarios, n_sim) simulated rates; distributions holds its rows
+        self.scenario_names = []  # Scenario of each sims_matrix row
+        self.presorted = False  # True when every distribution is sorted ascending
+        self._draws = np.empty((4, 0), dtype=np.float32)  # Uniform draws buffer, reused while n_sim is unchanged
+        self._sorted = {}  # Scenario -> (distribution, sorted copy), filled on first quantile query
+
     def simulate_exchange_rate_uip_ppp(self, S_t, theta, n_sim,
                                       i_dom_range, i_for_range,
                                       pi_dom_range, pi_for_range,
-                                      sesgo_tasa_dom=False, skew_params=None):
+                                      sesgo_tasa_dom=False, skew_params=None, rng=None):
         """
         Simulate exchange rate changes using UIP + PPP model
-        
+
+        Runs the batch kernel on a single (4, 1) column of ranges with its
+        own draws, drawn like simulate_news_factors. Does not modify the
+        simulator state.
+
         Parameters:
         -----------
         S_t : float
@@ -42,93 +215,211 @@ class ExchangeRateSimulator:
             Whether to use skewed distribution for domestic rate
         skew_params : dict
             Parameters for skewed normal distribution
-            
+        rng : numpy.random.Generator, optional
+            Random number generator (a fresh one is created if None)
+
         Returns:
         --------
         numpy.ndarray
-            Simulated exchange rates
+            Simulated exchange rates (float32, in draw order)
         """
-        # Generate random variables
-        i_for = np.random.uniform(*i_for_range, n_sim)
-        pi_dom = np.random.uniform(*pi_dom_range, n_sim)
-        pi_for = np.random.uniform(*pi_for_range, n_sim)
+        if rng is None:
+            rng = np.random.default_rng()
+
+        draws = rng.random((4, n_sim), dtype=np.float32)
+        base = np.array([i_dom_range, i_for_range, pi_dom_range, pi_for_range], dtype=np.float64)
+        lows = base[:, :1].copy()
+        widths = base[:, 1:] - base[:, :1]
 
-        # Generate domestic interest rate
         if sesgo_tasa_dom:
             if skew_params is None:
                 skew_params = {'loc': np.mean(i_dom_range), 'scale': 0.01, 'skew': 5}
-            i_dom = skewnorm.rvs(
-                a=skew_params['skew'],
-                loc=skew_params['loc'],
-                scale=skew_params['scale'],
-                size=n_sim
-            )
-        else:
-            i_dom = np.random.uniform(*i_dom_range, n_sim)
+            lows[0] = skew_params['loc']
+            widths[0] = skew_params['scale']
+            draws[0] = _skewnorm_rvs(a=skew_params['skew'], loc=0, scale=1, size=n_sim, rng=rng,
+                                     dtype=np.float32)
+
+        sims = np.empty((1, n_sim), dtype=np.float32)
+        _uip_ppp_kernel(float(S_t), float(theta), lows, widths, draws, sims)
+        return sims[0]
 
-        # Calculate exchange rate change using UIP + PPP
-        delta_e = theta * (i_dom - i_for) + (1 - theta) * (pi_dom - pi_for)
-        return S_t * (1 + delta_e)
+    def simulate_single_scenario(self, name, S_t, theta, n_sim,
+                                 i_dom_range, i_for_range,
+                                 pi_dom_range, pi_for_range,
+                                 sesgo_tasa_dom=False, skew_params=None, seed=None):
+        """
+        Simulate a single news scenario
+        
+        Shifts the ranges by this scenario's row of SHIFT_TABLE and simulates
+        only that scenario with simulate_exchange_rate_uip_ppp. The draws
+        match simulate_news_impact with the same seed, so the distribution is
+        that scenario's row (float32, sorted ascending). Does not modify the
+        simulator state, so scenarios can be run in parallel.
+        
+        Parameters:
+        -----------
+        name : str
+            Scenario name (key of SCENARIOS)
+        Rest same as simulate_news_impact
+        
+        Returns:
+        --------
+        tuple
+            (dict with summary statistics row, numpy.ndarray with simulated rates)
+        """
+        # Adjust ranges based on scenario shifts, shape (4, 2)
+        base = np.array([i_dom_range, i_for_range, pi_dom_range, pi_for_range], dtype=np.float64)
+        i_dom_r, i_for_r, pi_dom_r, pi_for_r = base + SHIFT_TABLE[SCENARIO_NAMES.index(name), :, None]
+
+        sims = self.simulate_exchange_rate_uip_ppp(
+            S_t, theta, n_sim,
+            i_dom_r, i_for_r,
+            pi_dom_r, pi_for_r,
+            sesgo_tasa_dom, skew_params,
+            rng=np.random.default_rng(seed)
+        )
+        sims.sort()
+        return _summary_stats([name], sims[None, :], presorted=True).iloc[0].to_dict(), sims
     
     def simulate_news_impact(self, S_t, theta, n_sim,
                             i_dom_range, i_for_range,
                             pi_dom_range, pi_for_range,
-                            sesgo_tasa_dom=False, skew_params=None):
+                            sesgo_tasa_dom=False, skew_params=None, seed=None):
         """
         Simulate impact of different news scenarios on exchange rate
         
+        Equivalent to apply_spot(S_t, simulate_news_factors(...)); callers
+        exploring several spot rates can keep the factors and only call
+        apply_spot again.
+        
         Parameters:
         -----------
-        Same as simulate_exchange_rate_uip_ppp
+        S_t : float
+            Current spot exchange rate
+        theta : float
+            Weight between UIP and PPP (0-1)
+        n_sim : int
+            Number of simulations
+        i_dom_range : tuple
+            Range for domestic interest rate (min, max)
+        i_for_range : tuple
+            Range for foreign interest rate (min, max)
+        pi_dom_range : tuple
+            Range for domestic inflation (min, max)
+        pi_for_range : tuple
+            Range for foreign inflation (min, max)
+        sesgo_tasa_dom : bool
+            Whether to use skewed distribution for domestic rate
+        skew_params : dict
+            Parameters for skewed normal distribution
+        seed : int or numpy.random.SeedSequence, optional
+            Seed for the random number generator
         
         Returns:
         --------
         tuple
             (DataFrame with results, dict with distributions)
         """
-        scenarios = {
-            'Normal': {},
-            'Subida tasas BanRep': {'i_dom_shift': 0.015},
-            'Desanclaje inflacionario': {'pi_dom_shift': 0.02},
-            'Choque externo': {'i_for_shift': -0.01, 'pi_for_shift': -0.005},
-        }
-
-        results = []
-        distributions = {}
+        factors = self.simulate_news_factors(
+            theta, n_sim,
+            i_dom_range, i_for_range,
+            pi_dom_range, pi_for_range,
+            sesgo_tasa_dom, skew_params, seed
+        )
+        return self.apply_spot(S_t, factors)
+    
+    def simulate_news_factors(self, theta, n_sim,
+                              i_dom_range, i_for_range,
+                              pi_dom_range, pi_for_range,
+                              sesgo_tasa_dom=False, skew_params=None, seed=None):
+        """
+        Simulate the spot-independent part of every news scenario: 1 + delta_e
         
-        for name, shifts in scenarios.items():
-            # Adjust ranges based on scenario shifts
-            i_dom_r = (i_dom_range[0] + shifts.get('i_dom_shift', 0),
-                       i_dom_range[1] + shifts.get('i_dom_shift', 0))
-            i_for_r = (i_for_range[0] + shifts.get('i_for_shift', 0),
-                       i_for_range[1] + shifts.get('i_for_shift', 0))
-            pi_dom_r = (pi_dom_range[0] + shifts.get('pi_dom_shift', 0),
-                        pi_dom_range[1] + shifts.get('pi_dom_shift', 0))
-            pi_for_r = (pi_for_range[0] + shifts.get('pi_for_shift', 0),
-                        pi_for_range[1] + shifts.get('pi_for_shift', 0))
-
-            # Run simulation for this scenario
-            sims = self.simulate_exchange_rate_uip_ppp(
-                S_t, theta, n_sim,
-                i_dom_r, i_for_r,
-                pi_dom_r, pi_for_r,
-                sesgo_tasa_dom, skew_params
-            )
-
-            # Store results
-            distributions[name] = sims
-            results.append({
-                'Escenario': name,
-                'Media': np.mean(sims),
-                'P5': np.percentile(sims, 5),
-                'P95': np.percentile(sims, 95),
-                'Std': np.std(sims),
-                'Min': np.min(sims),
-                'Max': np.max(sims)
-            })
-
-        self.results = pd.DataFrame(results)
+        All scenarios are simulated in one batch: each random variable is
+        drawn once as Uniform(0, 1) (or standardized skew-normal) and mapped
+        affinely onto every scenario's shifted range, giving an
+        (n_scenarios, n_sim) matrix. Scenarios therefore share common random
+        numbers, so their differences reflect the shocks only. Draws and
+        factors are float32, halving memory traffic.
+        
+        Each scenario's row is then sorted ascending in place, so
+        percentiles, min/max, VaR and tail means downstream are index lookups
+        (see presorted). Path j of one scenario is therefore no longer the
+        same draw as path j of another.
+        
+        Does not modify the simulator results; see apply_spot.
+        
+        Parameters:
+        -----------
+        Same as simulate_news_impact, without S_t
+        
+        Returns:
+        --------
+        numpy.ndarray
+            (n_scenarios, n_sim) factors, rows in SCENARIO_NAMES order
+        """
+        rng = np.random.default_rng(seed)
+        n_scenarios = len(SCENARIO_NAMES)
+
+        # One draw per variable (i_dom, i_for, pi_dom, pi_for), shared by all
+        # scenarios; each variable is low + width * draw. Lower bounds for
+        # every scenario come from one broadcast against SHIFT_TABLE, shape (4, S)
+        if self._draws.shape[1] != n_sim:
+            self._draws = np.empty((4, n_sim), dtype=np.float32)
+        draws = rng.random(dtype=np.float32, out=self._draws)
+        base = np.array([i_dom_range, i_for_range, pi_dom_range, pi_for_range], dtype=np.float64)
+        lows = np.ascontiguousarray(base[:, :1] + SHIFT_TABLE.T)  # C layout, as compiled by warm_up_kernel
+        widths = np.repeat(base[:, 1:] - base[:, :1], n_scenarios, axis=1)
+
+        if sesgo_tasa_dom:
+            if skew_params is None:
+                # Centered on each scenario's shifted range
+                skew_params = {'loc': lows[0] + widths[0] / 2, 'scale': 0.01, 'skew': 5}
+            lows[0] = skew_params['loc']
+            widths[0] = skew_params['scale']
+            draws[0] = _skewnorm_rvs(a=skew_params['skew'], loc=0, scale=1, size=n_sim, rng=rng,
+                                     dtype=np.float32)
+
+        # UIP + PPP for all scenarios at once, with a unit spot rate
+        factors = np.empty((n_scenarios, n_sim), dtype=np.float32)
+        _uip_ppp_kernel(1.0, float(theta), lows, widths, draws, factors)
+        factors.sort(axis=1)
+        return factors
+    
+    def apply_spot(self, S_t, factors):
+        """
+        Turn simulate_news_factors output into exchange rates for a spot rate
+        
+        S_t * factors is a single multiply. It keeps every row sorted for
+        S_t >= 0; a negative S_t reverses the order, so the rows are then
+        multiplied back to front, which is still one pass. Stores the
+        results, matrix and distributions on the simulator like
+        simulate_news_impact.
+        
+        Parameters:
+        -----------
+        S_t : float
+            Current spot exchange rate
+        factors : numpy.ndarray
+            (n_scenarios, n_sim) output of simulate_news_factors
+        
+        Returns:
+        --------
+        tuple
+            (DataFrame with results, dict with distributions)
+        """
+        names = SCENARIO_NAMES
+        if S_t < 0:
+            factors = factors[:, ::-1]  # Reversed view: the product comes out ascending
+        sims = factors * np.float32(S_t)
+
+        # Rows of the matrix are the per-scenario distributions (views, no copies)
+        distributions = {name: sims[k] for k, name in enumerate(names)}
+        self.results = _summary_stats(names, sims, presorted=True)
+        self.sims_matrix = sims
+        self.scenario_names = list(names)
         self.distributions = distributions
+        self.presorted = True
         
         return self.results, self.distributions
     
@@ -140,27 +431,41 @@ class ExchangeRateSimulator:
         """Get summary statistics for all scenarios"""
         return self.results
     
+    def _sorted_distribution(self, scenario_name):
+        """Sorted copy of a scenario's distribution, shared by all quantile queries on it"""
+        data = self.distributions[scenario_name]
+        if self.presorted:
+            return data
+        cached = self._sorted.get(scenario_name)
+        if cached is None or cached[0] is not data:
+            # distributions may be replaced wholesale (the GUI does), so the
+            # cache entry is only valid for the very same array
+            cached = (data, np.sort(data))
+            self._sorted[scenario_name] = cached
+        return cached[1]
+    
     def calculate_confidence_intervals(self, confidence_level=0.95):
         """Calculate confidence intervals for all scenarios"""
         if self.results is None:
             return None
             
+        # Quantiles and column names are fixed for the whole table
         alpha = 1 - confidence_level
-        lower_percentile = (alpha / 2) * 100
-        upper_percentile = (1 - alpha / 2) * 100
+        quantiles = [(alpha / 2) * 100, (1 - alpha / 2) * 100]
+        label = f'CI_{int(confidence_level*100)}'
         
-        intervals = []
-        for scenario in self.results['Escenario']:
-            data = self.distributions[scenario]
-            lower = np.percentile(data, lower_percentile)
-            upper = np.percentile(data, upper_percentile)
-            intervals.append({
-                'Escenario': scenario,
-                f'CI_{int(confidence_level*100)}_lower': lower,
-                f'CI_{int(confidence_level*100)}_upper': upper
-            })
+        # Each scenario's bounds are two index lookups into its sorted data
+        scenarios = list(self.results['Escenario'])
+        bounds = np.array([
+            sorted_percentiles(self._sorted_distribution(scenario), quantiles)
+            for scenario in scenarios
+        ])
         
-        return pd.DataFrame(intervals)
+        return pd.DataFrame({
+            'Escenario': scenarios,
+            f'{label}_lower': bounds[:, 0],
+            f'{label}_upper': bounds[:, 1]
+        })
     
     def get_scenario_summary(self, scenario_name, S_t, i_dom, i_for, plazo_dias=180, base_anual=360):
         """
@@ -180,8 +485,9 @@ class ExchangeRateSimulator:
         if scenario_name not in self.distributions:
             return None
             
-        datos = self.distributions[scenario_name]
-        return calcular_resumen_escenario(datos, S_t, i_dom, i_for, plazo_dias, base_anual)
+        datos = self._sorted_distribution(scenario_name)
+        return calcular_resumen_escenario(datos, S_t, i_dom, i_for, plazo_dias, base_anual,
+                                          ordenados=True)
 
 
 # Utility functions for data analysis
@@ -189,27 +495,66 @@ def calculate_var(data, confidence_level=0.95):
     """Calculate Value at Risk"""
     return np.percentile(data, (1 - confidence_level) * 100)
 
-def calculate_expected_shortfall(data, confidence_level=0.95):
-    """Calculate Expected Shortfall (Conditional VaR)"""
-    var = calculate_var(data, confidence_level)
-    return np.mean(data[data <= var])
+def calculate_expected_shortfall(data, confidence_level=0.95, presorted=False):
+    """
+    Calculate Expected Shortfall (Conditional VaR)
 
-def analyze_tail_risk(distributions, confidence_level=0.95):
-    """Analyze tail risk across all scenarios"""
-    tail_analysis = []
-    
-    for scenario, data in distributions.items():
+    With presorted=True (data sorted ascending) the tail is the prefix of
+    values up to the VaR, averaged without a boolean mask or gathered copy.
+    """
+    if not presorted:
         var = calculate_var(data, confidence_level)
-        es = calculate_expected_shortfall(data, confidence_level)
-        
-        tail_analysis.append({
-            'Escenario': scenario,
-            'VaR': var,
-            'Expected_Shortfall': es,
-            'Tail_Probability': (1 - confidence_level)
-        })
-    
-    return pd.DataFrame(tail_analysis)
+        return np.mean(data[data <= var])
+    var = sorted_percentiles(data, (1 - confidence_level) * 100)
+    k = np.searchsorted(data, var, side='right')
+    return data[:k].mean(dtype=np.float64)
+
+def analyze_tail_risk(distributions, confidence_level=0.95, names=None, presorted=False):
+    """
+    Analyze tail risk across all scenarios
+
+    distributions is either a dict of scenario -> simulated rates or an
+    (n_scenarios, n_sim) matrix such as ExchangeRateSimulator.sims_matrix
+    (with its scenario names). For a matrix, VaR and Expected Shortfall of
+    every scenario are computed together with reductions along axis 1;
+    dict entries may differ in length, so they are reduced one by one
+    without stacking. presorted=True (every row sorted ascending) reads VaR
+    by index and averages each tail as a prefix.
+    """
+    q = (1 - confidence_level) * 100
+    if isinstance(distributions, dict):
+        names = list(distributions)
+        rows = [np.asarray(data) for data in distributions.values()]
+        if presorted:
+            var = np.array([sorted_percentiles(row, q) for row in rows])
+        else:
+            var = np.array([np.percentile(row, q) for row in rows])
+            es = np.array([row[row <= v].mean(dtype=np.float64) for row, v in zip(rows, var)])
+    else:
+        rows = np.asarray(distributions)
+        if names is None:
+            names = list(range(len(rows)))
+        if presorted:
+            var = sorted_percentiles(rows, q)
+        else:
+            var = np.percentile(rows, q, axis=1)
+            mask = rows <= var[:, None]
+            es = np.sum(rows, axis=1, where=mask, dtype=np.float64) / mask.sum(axis=1)
+
+    if presorted:
+        # Each tail is the prefix up to that row's VaR: a binary search for
+        # its length, then a contiguous mean
+        es = np.array([
+            row[:np.searchsorted(row, v, side='right')].mean(dtype=np.float64)
+            for row, v in zip(rows, var)
+        ])
+
+    return pd.DataFrame({
+        'Escenario': list(names),
+        'VaR': var,
+        'Expected_Shortfall': es,
+        'Tail_Probability': (1 - confidence_level)
+    })
 
 def calcular_forward_cip(S_t, i_dom, i_for, plazo_dias, base_anual=360):
     """
@@ -222,14 +567,17 @@ def calcular_forward_cip(S_t, i_dom, i_for, plazo_dias, base_anual=360):
     - plazo_dias: Plazo del forward en días (ej. 180 para 6 meses).
     - base_anual: Base de cálculo (360 o 365 según convención).
 
+    Acepta escalares o arrays (p. ej. las tasas de varios escenarios a la vez).
+
     Retorna:
     - Tipo de cambio forward implícito.
     """
     n = plazo_dias / base_anual  # fracción del año
-    F_tT = S_t * ((1 + i_dom) / (1 + i_for))**n
+    # ((1 + i_dom) / (1 + i_for))**n vía exp/log1p: sin pow y más preciso con tasas pequeñas
+    F_tT = S_t * np.exp(n * (np.log1p(i_dom) - np.log1p(i_for)))
     return F_tT
 
-def calcular_resumen_escenario(datos, S_t, i_dom, i_for, plazo_dias=180, base_anual=360):
+def calcular_resumen_escenario(datos, S_t, i_dom, i_for, plazo_dias=180, base_anual=360, ordenados=False):
     """
     Calcula un resumen completo de estadísticas para un escenario.
     
@@ -240,17 +588,18 @@ def calcular_resumen_escenario(datos, S_t, i_dom, i_for, plazo_dias=180, base_an
     - i_for: Tasa de interés extranjera
     - plazo_dias: Plazo para forward (días)
     - base_anual: Base de cálculo para forward
+    - ordenados: True si datos ya está ordenado ascendentemente (los
+      percentiles se leen por índice, sin recorrer los datos)
     
     Retorna:
     - Diccionario con todas las estadísticas
     """
     # Estadísticas básicas
-    media = np.mean(datos)
-    p1 = np.percentile(datos, 1)
-    p5 = np.percentile(datos, 5)
-    p50 = np.percentile(datos, 50)
-    p95 = np.percentile(datos, 95)
-    p99 = np.percentile(datos, 99)
+    media = np.mean(datos, dtype=np.float64)
+    if ordenados:
+        p1, p5, p50, p95, p99 = sorted_percentiles(datos, [1, 5, 50, 95, 99])
+    else:
+        p1, p5, p50, p95, p99 = np.percentile(datos, [1, 5, 50, 95, 99])
     
     # VaR en COP (asumiendo 1 USD de exposición)
     var_5pct_cop = p5  # P5 ya está en COP/USD